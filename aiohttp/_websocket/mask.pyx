@@ -5,29 +5,52 @@ from cpython cimport PyBytes_AsString
 cdef extern from "Python.h":
     char* PyByteArray_AsString(bytearray ba) except NULL
 
-from libc.stdint cimport uint32_t, uint64_t, uintmax_t
+from libc.stdint cimport uint32_t, uint64_t, uintmax_t, uintptr_t
+from libc.string cimport memcpy
+
+
+cdef extern from "mask_simd.h":
+    size_t ws_mask_simd(unsigned char *buf, size_t len, const unsigned char *mask)
 
 
 cpdef void _websocket_mask_cython(bytes mask, bytearray data):
     """Note, this function mutates its `data` argument
     """
     cdef:
-        Py_ssize_t data_len, i
+        Py_ssize_t data_len, head, i
         # bit operations on signed integers are implementation-specific
         unsigned char * in_buf
         const unsigned char * mask_buf
+        unsigned char rotated_msk[4]
         uint32_t uint32_msk
         uint64_t uint64_msk
+        size_t processed
 
     assert len(mask) == 4
 
     data_len = len(data)
     in_buf = <unsigned char*>PyByteArray_AsString(data)
     mask_buf = <const unsigned char*>PyBytes_AsString(mask)
-    uint32_msk = (<uint32_t*>mask_buf)[0]
 
-    # TODO: align in_data ptr to achieve even faster speeds
-    # does it need in python ?! malloc() always aligns to sizeof(long) bytes
+    # Mask as much as possible with vector instructions, the loops below
+    # handle the remaining bytes (or everything when SIMD is unavailable)
+    processed = ws_mask_simd(in_buf, <size_t>data_len, mask_buf)
+    in_buf += processed
+    data_len -= <Py_ssize_t>processed
+
+    # Mask byte by byte until in_buf is 8 byte aligned so the word loops
+    # below never do unaligned loads, then rotate the mask by the number
+    # of bytes consumed to keep it in phase with the data.
+    head = (8 - <Py_ssize_t>(<uintptr_t>in_buf & 7)) & 7
+    if head > data_len:
+        head = data_len
+    for i in range(head):
+        in_buf[i] ^= mask_buf[i & 3]
+    in_buf += head
+    data_len -= head
+    for i in range(4):
+        rotated_msk[i] = mask_buf[(i + head) & 3]
+    memcpy(&uint32_msk, rotated_msk, 4)
 
     if sizeof(size_t) >= 8:
         uint64_msk = uint32_msk
@@ -45,4 +68,4 @@ cpdef void _websocket_mask_cython(bytes mask, bytearray data):
         data_len -= 4
 
     for i in range(0, data_len):
-        in_buf[i] ^= mask_buf[i]
+        in_buf[i] ^= rotated_msk[i]
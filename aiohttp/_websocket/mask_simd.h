@@ -0,0 +1,105 @@
+#ifndef AIOHTTP_WEBSOCKET_MASK_SIMD_H
+#define AIOHTTP_WEBSOCKET_MASK_SIMD_H
+
+/*
+ * Vectorized prefix for the websocket masking loop.
+ *
+ * The 4 byte mask is broadcast into a vector register and XORed against
+ * the payload 16 (SSE2 / NEON) or 32 (AVX2) bytes at a time.  Vector
+ * widths are multiples of 4, so the mask phase is unchanged after each
+ * block and the caller can finish the tail with its scalar loop.
+ *
+ * SSE2 and NEON are part of the x86-64 and AArch64 baselines.  AVX2 is
+ * only used when the compiler can target it per function and the CPU
+ * reports support for it at runtime.
+ */
+
+#include <stddef.h>
+#include <stdint.h>
+#include <string.h>
+
+#if defined(__SSE2__) || defined(_M_X64) || \
+    (defined(_M_IX86_FP) && _M_IX86_FP >= 2)
+#define WS_MASK_SSE2 1
+#include <emmintrin.h>
+#elif defined(__ARM_NEON) || defined(__ARM_NEON__) || defined(_M_ARM64)
+#define WS_MASK_NEON 1
+#include <arm_neon.h>
+#endif
+
+#if defined(WS_MASK_SSE2) && defined(__x86_64__) && \
+    (defined(__GNUC__) || defined(__clang__)) && !defined(_MSC_VER)
+#define WS_MASK_AVX2 1
+#include <immintrin.h>
+
+__attribute__((target("avx2"))) static size_t
+ws_mask_avx2(unsigned char *buf, size_t len, uint32_t mask32)
+{
+    const __m256i key = _mm256_set1_epi32((int32_t)mask32);
+    size_t i = 0;
+
+    for (; i + 32 <= len; i += 32) {
+        __m256i v = _mm256_loadu_si256((const __m256i *)(buf + i));
+        _mm256_storeu_si256((__m256i *)(buf + i), _mm256_xor_si256(v, key));
+    }
+    return i;
+}
+
+static int
+ws_mask_has_avx2(void)
+{
+    static int has_avx2 = -1;
+
+    if (has_avx2 < 0) {
+        __builtin_cpu_init();
+        has_avx2 = __builtin_cpu_supports("avx2") ? 1 : 0;
+    }
+    return has_avx2;
+}
+#endif
+
+/*
+ * Mask the leading part of `buf` in place and return the number of bytes
+ * processed.  The result is always a multiple of 4.
+ */
+static size_t
+ws_mask_simd(unsigned char *buf, size_t len, const unsigned char *mask)
+{
+    size_t i = 0;
+    uint32_t mask32;
+
+    memcpy(&mask32, mask, 4);
+
+#if defined(WS_MASK_AVX2)
+    if (len >= 32 && ws_mask_has_avx2()) {
+        i = ws_mask_avx2(buf, len, mask32);
+    }
+#endif
+
+#if defined(WS_MASK_SSE2)
+    {
+        const __m128i key = _mm_set1_epi32((int32_t)mask32);
+
+        for (; i + 16 <= len; i += 16) {
+            __m128i v = _mm_loadu_si128((const __m128i *)(buf + i));
+            _mm_storeu_si128((__m128i *)(buf + i), _mm_xor_si128(v, key));
+        }
+    }
+#elif defined(WS_MASK_NEON)
+    {
+        const uint8x16_t key = vreinterpretq_u8_u32(vdupq_n_u32(mask32));
+
+        for (; i + 16 <= len; i += 16) {
+            vst1q_u8(buf + i, veorq_u8(vld1q_u8(buf + i), key));
+        }
+    }
+#else
+    (void)buf;
+    (void)len;
+    (void)mask32;
+#endif
+
+    return i;
+}
+
+#endif /* AIOHTTP_WEBSOCKET_MASK_SIMD_H */
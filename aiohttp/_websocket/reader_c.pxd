@@ -15,9 +15,8 @@ cdef unsigned int OP_CODE_CLOSE
 cdef unsigned int OP_CODE_PING
 cdef unsigned int OP_CODE_PONG
 
-cdef object UNPACK_LEN3
-cdef object UNPACK_CLOSE_CODE
 cdef object TUPLE_NEW
+cdef object cython_int
 
 cdef object WSMsgType
 
@@ -30,7 +29,7 @@ cdef object WSMessageClose
 cdef object WS_MSG_TYPE_TEXT
 cdef object WS_MSG_TYPE_BINARY
 
-cdef set ALLOWED_CLOSE_CODES
+cdef frozenset ALLOWED_CLOSE_CODES
 cdef set MESSAGE_TYPES_WITH_CONTENT
 
 cdef tuple EMPTY_FRAME
@@ -45,17 +44,19 @@ cdef class WebSocketReader:
 
     cdef Exception _exc
     cdef bytearray _partial
+    cdef Py_ssize_t _partial_len
     cdef unsigned int _state
 
     cdef object _opcode
-    cdef object _frame_fin
+    cdef bint _frame_fin
     cdef object _frame_opcode
     cdef bytearray _frame_payload
+    cdef list _frames
 
     cdef bytes _tail
     cdef bint _has_mask
     cdef bytes _frame_mask
-    cdef unsigned int _payload_length
+    cdef Py_ssize_t _payload_length
     cdef unsigned int _payload_length_flag
     cdef object _compressed
     cdef object _decompressobj
@@ -64,26 +65,46 @@ cdef class WebSocketReader:
     cpdef tuple feed_data(self, object data)
 
     @cython.locals(
+        frames=list,
         is_continuation=bint,
         fin=bint,
-        has_partial=bint,
+        partial_len=Py_ssize_t,
+        msg_len=Py_ssize_t,
         payload_merged=bytes,
+        payload_cstr="const unsigned char *",
+        close_code="unsigned int",
         opcode="unsigned int",
     )
     cpdef void _feed_data(self, bytes data)
 
     @cython.locals(
-        start_pos="unsigned int",
-        buf_len="unsigned int",
-        length="unsigned int",
-        chunk_size="unsigned int",
-        chunk_len="unsigned int",
-        buf_length="unsigned int",
-        data=bytes,
+        max_length=Py_ssize_t,
+        trailer_max_length=Py_ssize_t,
+        left=Py_ssize_t,
+    )
+    cdef bytes _decompress(self, object data, bint final)
+
+    @cython.locals(frames=list, needed=Py_ssize_t, tail=bytes)
+    cpdef list parse_frame(self, bytes buf)
+
+    @cython.locals(
+        frames=list,
+        buf_length=Py_ssize_t,
+        length=Py_ssize_t,
+        chunk_len=Py_ssize_t,
+        end_pos=Py_ssize_t,
+        buf_cstr="const unsigned char *",
         payload=bytearray,
         first_byte="unsigned char",
         second_byte="unsigned char",
+        rsv1="unsigned char",
+        opcode="unsigned char",
+        state="unsigned int",
+        payload_length=Py_ssize_t,
+        payload_length_flag="unsigned int",
         has_mask=bint,
+        frame_mask=bytes,
+        frame_fin=bint,
         fin=bint,
     )
-    cpdef list parse_frame(self, bytes buf)
+    cdef void _parse_buffer(self, bytes buf, Py_ssize_t start_pos)
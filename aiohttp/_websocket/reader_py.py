@@ -1,11 +1,11 @@
 """Reader for WebSocket protocol versions 13 and 8."""
 
-from typing import Final, List, Optional, Set, Tuple, Union
+from typing import Final, FrozenSet, List, Optional, Tuple, Union
 
 from ..compression_utils import ZLibDecompressor
 from ..helpers import set_exception
 from ..streams import DataQueue
-from .helpers import UNPACK_CLOSE_CODE, UNPACK_LEN3, websocket_mask
+from .helpers import websocket_mask
 from .models import (
     WS_DEFLATE_TRAILING,
     WebSocketError,
@@ -19,7 +19,7 @@ from .models import (
     WSMsgType,
 )
 
-ALLOWED_CLOSE_CODES: Final[Set[int]] = {int(i) for i in WSCloseCode}
+ALLOWED_CLOSE_CODES: Final[FrozenSet[int]] = frozenset(int(i) for i in WSCloseCode)
 
 # States for the reader, used to parse the WebSocket frame
 # integer values are used so they can be cythonized
@@ -44,6 +44,10 @@ EMPTY_FRAME = (False, b"")
 
 TUPLE_NEW = tuple.__new__
 
+# Annotation for integer arguments declared as C integers in reader_c.pxd,
+# a plain int annotation makes Cython expect a Python int object instead
+cython_int = int
+
 
 class WebSocketReader:
     def __init__(
@@ -55,12 +59,14 @@ class WebSocketReader:
 
         self._exc: Optional[Exception] = None
         self._partial = bytearray()
+        self._partial_len = 0
         self._state = READ_HEADER
 
         self._opcode: Optional[int] = None
         self._frame_fin = False
         self._frame_opcode: Optional[int] = None
         self._frame_payload = bytearray()
+        self._frames: List[Tuple[bool, Optional[int], bytes, Optional[bool]]] = []
 
         self._tail: bytes = b""
         self._has_mask = False
@@ -76,7 +82,8 @@ class WebSocketReader:
 
     # data can be bytearray on Windows because proactor event loop uses bytearray
     # and asyncio types this to Union[bytes, bytearray, memoryview] so we need
-    # coerce data to bytes if it is not
+    # coerce data to bytes if it is not. Doing it once here lets the parser
+    # slice bytes everywhere, rather than copying each slice it keeps.
     def feed_data(
         self, data: Union[bytes, bytearray, memoryview]
     ) -> Tuple[bool, bytes]:
@@ -89,6 +96,7 @@ class WebSocketReader:
         try:
             self._feed_data(data)
         except Exception as exc:
+            self._frames.clear()
             self._exc = exc
             set_exception(self.queue, exc)
             return EMPTY_FRAME_ERROR
@@ -97,7 +105,8 @@ class WebSocketReader:
 
     def _feed_data(self, data: bytes) -> None:
         msg: WSMessage
-        for frame in self.parse_frame(data):
+        frames = self.parse_frame(data)
+        for frame in frames:
             fin = frame[0]
             opcode = frame[1]
             payload = frame[2]
@@ -110,17 +119,23 @@ class WebSocketReader:
                     # got partial frame payload
                     if not is_continuation:
                         self._opcode = opcode
-                    self._partial += payload
-                    if self._max_msg_size and len(self._partial) >= self._max_msg_size:
+                    if compressed:
+                        # Inflate fragments as they arrive instead of holding
+                        # on to the whole compressed message until the end.
+                        payload = self._decompress(payload, False)
+                    # Check the size before growing the buffer
+                    partial_len = self._partial_len + len(payload)
+                    if self._max_msg_size and partial_len >= self._max_msg_size:
                         raise WebSocketError(
                             WSCloseCode.MESSAGE_TOO_BIG,
                             "Message size {} exceeds limit {}".format(
-                                len(self._partial), self._max_msg_size
+                                partial_len, self._max_msg_size
                             ),
                         )
+                    self._partial += payload
+                    self._partial_len = partial_len
                     continue
 
-                has_partial = bool(self._partial)
                 if is_continuation:
                     if self._opcode is None:
                         raise WebSocketError(
@@ -131,51 +146,47 @@ class WebSocketReader:
                     self._opcode = None
                 # previous frame was non finished
                 # we should get continuation opcode
-                elif has_partial:
+                # (compressed fragments may inflate to nothing, so a message
+                # in progress can't be told from the partial buffer size)
+                elif self._opcode is not None:
                     raise WebSocketError(
                         WSCloseCode.PROTOCOL_ERROR,
                         "The opcode in non-fin frame is expected "
                         "to be zero, got {!r}".format(opcode),
                     )
 
-                if has_partial:
-                    assembled_payload = self._partial + payload
-                    self._partial.clear()
-                else:
-                    assembled_payload = payload
-
-                if self._max_msg_size and len(assembled_payload) >= self._max_msg_size:
-                    raise WebSocketError(
-                        WSCloseCode.MESSAGE_TOO_BIG,
-                        "Message size {} exceeds limit {}".format(
-                            len(assembled_payload), self._max_msg_size
-                        ),
-                    )
-
-                # Decompress process must to be done after all packets
-                # received.
+                # Earlier fragments of a compressed message are already
+                # inflated, the final one also terminates the deflate block.
                 if compressed:
-                    if not self._decompressobj:
-                        self._decompressobj = ZLibDecompressor(
-                            suppress_deflate_header=True
-                        )
-                    payload_merged = self._decompressobj.decompress_sync(
-                        assembled_payload + WS_DEFLATE_TRAILING, self._max_msg_size
-                    )
-                    if self._decompressobj.unconsumed_tail:
-                        left = len(self._decompressobj.unconsumed_tail)
+                    payload = self._decompress(payload, True)
+
+                # The size of compressed messages is limited while inflating,
+                # others are checked before the fragments are assembled.
+                if not compressed and self._max_msg_size:
+                    msg_len = self._partial_len + len(payload)
+                    if msg_len >= self._max_msg_size:
                         raise WebSocketError(
                             WSCloseCode.MESSAGE_TOO_BIG,
-                            "Decompressed message size {} exceeds limit {}".format(
-                                self._max_msg_size + left, self._max_msg_size
+                            "Message size {} exceeds limit {}".format(
+                                msg_len, self._max_msg_size
                             ),
                         )
+
+                assembled_payload: Union[bytes, bytearray]
+                if self._partial_len != 0:
+                    assembled_payload = self._partial + payload
+                    self._partial.clear()
+                    self._partial_len = 0
                 else:
-                    payload_merged = bytes(assembled_payload)
+                    assembled_payload = payload
 
                 if opcode == OP_CODE_TEXT:
+                    # Decode straight from the assembled buffer, going through
+                    # bytes() first would copy fragmented messages once more.
+                    # The UTF-8 decoder already scans ASCII runs a machine word
+                    # at a time, so an isascii() pre-check only adds a pass.
                     try:
-                        text = payload_merged.decode("utf-8")
+                        text = assembled_payload.decode("utf-8")
                     except UnicodeDecodeError as exc:
                         raise WebSocketError(
                             WSCloseCode.INVALID_TEXT, "Invalid UTF-8 text message"
@@ -187,6 +198,7 @@ class WebSocketReader:
                     # test_client_ws_functional.py if this is wrong.
                     msg = TUPLE_NEW(WSMessageText, (text, "", WS_MSG_TYPE_TEXT))
                 else:
+                    payload_merged = bytes(assembled_payload)
                     msg = TUPLE_NEW(
                         WSMessageBinary, (payload_merged, "", WS_MSG_TYPE_BINARY)
                     )
@@ -194,14 +206,19 @@ class WebSocketReader:
                 self._queue_feed_data(msg)
             elif opcode == OP_CODE_CLOSE:
                 if len(payload) >= 2:
-                    close_code = UNPACK_CLOSE_CODE(payload[:2])[0]
+                    # A typed pointer when cythonized, like buf_cstr
+                    payload_cstr = payload
+                    close_code = payload_cstr[0] << 8 | payload_cstr[1]
                     if close_code < 3000 and close_code not in ALLOWED_CLOSE_CODES:
                         raise WebSocketError(
                             WSCloseCode.PROTOCOL_ERROR,
                             f"Invalid close code: {close_code}",
                         )
+                    # The reason is at most 123 bytes, too short for anything
+                    # but a plain decode. Cython decodes the pointer slice
+                    # straight out of the payload.
                     try:
-                        close_message = payload[2:].decode("utf-8")
+                        close_message = payload_cstr[2 : len(payload)].decode("utf-8")
                     except UnicodeDecodeError as exc:
                         raise WebSocketError(
                             WSCloseCode.INVALID_TEXT, "Invalid UTF-8 text message"
@@ -230,31 +247,109 @@ class WebSocketReader:
                     WSCloseCode.PROTOCOL_ERROR, f"Unexpected opcode={opcode!r}"
                 )
 
+        # The list is reused, don't keep the payloads alive until more
+        # data arrives on the connection.
+        frames.clear()
+
+    def _decompress(self, data: Union[bytes, bytearray], final: bool) -> bytes:
+        """Inflate data of a compressed message, enforcing the size limit.
+
+        The deflate block is terminated after the final fragment.
+        """
+        if self._decompressobj is None:
+            self._decompressobj = ZLibDecompressor(suppress_deflate_header=True)
+        # The limit applies to the whole message, so only allow
+        # what is left after the fragments inflated so far.
+        max_length = 0
+        if self._max_msg_size:
+            max_length = self._max_msg_size - self._partial_len
+        decompressed = self._decompressobj.decompress_sync(data, max_length)
+        if final and not self._decompressobj.unconsumed_tail:
+            # Feed the trailer in a second call rather than copying the
+            # whole payload just to append 4 bytes to it. A limit of 0
+            # means no limit, 1 is enough to detect an overflow.
+            trailer_max_length = 0
+            if max_length:
+                trailer_max_length = max(max_length - len(decompressed), 1)
+            decompressed += self._decompressobj.decompress_sync(
+                WS_DEFLATE_TRAILING, trailer_max_length
+            )
+        left = len(self._decompressobj.unconsumed_tail)
+        if left or (max_length and len(decompressed) > max_length):
+            raise WebSocketError(
+                WSCloseCode.MESSAGE_TOO_BIG,
+                "Decompressed message size {} exceeds limit {}".format(
+                    self._partial_len + len(decompressed) + left,
+                    self._max_msg_size,
+                ),
+            )
+        return decompressed
+
     def parse_frame(
         self, buf: bytes
-    ) -> List[Tuple[bool, Optional[int], bytearray, Optional[bool]]]:
-        """Return the next frame from the socket."""
-        frames: List[Tuple[bool, Optional[int], bytearray, Optional[bool]]] = []
-        if self._tail:
-            buf, self._tail = self._tail + buf, b""
+    ) -> List[Tuple[bool, Optional[int], bytes, Optional[bool]]]:
+        """Return the next frame from the socket.
+
+        The returned list is reused, it is only valid until the next call.
+        """
+        frames = self._frames
+        frames.clear()
+        if not self._tail:
+            self._parse_buffer(buf, 0)
+            return frames
+
+        # Only an incomplete header field is ever left over, so instead of
+        # copying the whole new chunk after it, splice just the bytes needed
+        # to complete that field and parse the rest of the chunk in place.
+        if self._state == READ_HEADER:
+            needed = 2
+        elif self._state == READ_PAYLOAD_MASK:
+            needed = 4
+        elif self._payload_length_flag == 126:
+            needed = 2
+        else:
+            needed = 8
+        needed -= len(self._tail)
+        tail, self._tail = self._tail, b""
+        self._parse_buffer(tail + buf[:needed], 0)
+        if not self._tail:
+            self._parse_buffer(buf, needed)
+        return frames
 
-        start_pos: int = 0
+    def _parse_buffer(self, buf: bytes, start_pos: Union[int, cython_int]) -> None:
+        """Feed frames found in buf, starting at start_pos, to self._frames."""
+        frames = self._frames
         buf_length = len(buf)
+        # When cythonized, this is a typed pointer into the bytes buffer
+        # so header bytes can be read without creating Python ints.
+        buf_cstr = buf
+
+        # The state machine runs on locals, they are written back to the
+        # instance once the buffer is exhausted.
+        state = self._state
+        payload_length = self._payload_length
+        payload_length_flag = self._payload_length_flag
+        has_mask = self._has_mask
+        payload = self._frame_payload
+        frame_mask = self._frame_mask
+        frame_fin = self._frame_fin
+        frame_opcode = self._frame_opcode
+        compressed = self._compressed
+        # Made on first use, extending the payload from a memoryview slice
+        # avoids building an intermediate bytes object for every slice.
+        buf_view: Optional[memoryview] = None
 
         while True:
             # read header
-            if self._state == READ_HEADER:
+            if state == READ_HEADER:
                 if buf_length - start_pos < 2:
                     break
-                data = buf[start_pos : start_pos + 2]
+                first_byte = buf_cstr[start_pos]
+                second_byte = buf_cstr[start_pos + 1]
                 start_pos += 2
-                first_byte = data[0]
-                second_byte = data[1]
 
-                fin = (first_byte >> 7) & 1
-                rsv1 = (first_byte >> 6) & 1
-                rsv2 = (first_byte >> 5) & 1
-                rsv3 = (first_byte >> 4) & 1
+                fin = first_byte & 0x80
+                rsv1 = first_byte & 0x40
                 opcode = first_byte & 0xF
 
                 # frame-fin = %x0 ; more frames of this message follow
@@ -267,19 +362,19 @@ class WebSocketReader:
                 #    1 bit, MUST be 0 unless negotiated otherwise
                 #
                 # Remove rsv1 from this test for deflate development
-                if rsv2 or rsv3 or (rsv1 and not self._compress):
+                # rsv2 and rsv3 (0x30) are tested together with a single mask
+                if first_byte & 0x30 or (rsv1 and not self._compress):
                     raise WebSocketError(
                         WSCloseCode.PROTOCOL_ERROR,
                         "Received frame with non-zero reserved bits",
                     )
 
-                if opcode > 0x7 and fin == 0:
+                if opcode > 0x7 and not fin:
                     raise WebSocketError(
                         WSCloseCode.PROTOCOL_ERROR,
                         "Received fragmented control frame",
                     )
 
-                has_mask = (second_byte >> 7) & 1
                 length = second_byte & 0x7F
 
                 # Control frames MUST have a payload
@@ -293,76 +388,106 @@ class WebSocketReader:
                 # Set compress status if last package is FIN
                 # OR set compress status if this is first fragment
                 # Raise error if not first fragment with rsv1 = 0x1
-                if self._frame_fin or self._compressed is None:
-                    self._compressed = True if rsv1 else False
+                if frame_fin or compressed is None:
+                    compressed = True if rsv1 else False
                 elif rsv1:
                     raise WebSocketError(
                         WSCloseCode.PROTOCOL_ERROR,
                         "Received frame with non-zero reserved bits",
                     )
 
-                self._frame_fin = bool(fin)
-                self._frame_opcode = opcode
-                self._has_mask = bool(has_mask)
-                self._payload_length_flag = length
-                self._state = READ_PAYLOAD_LENGTH
+                frame_fin = bool(fin)
+                frame_opcode = opcode
+                has_mask = bool(second_byte & 0x80)
+                payload_length_flag = length
+                if length < 126:
+                    # The length fits in the header, skip straight past the
+                    # extended payload length state.
+                    payload_length = length
+                    state = READ_PAYLOAD_MASK if has_mask else READ_PAYLOAD
+                else:
+                    state = READ_PAYLOAD_LENGTH
 
-            # read payload length
-            if self._state == READ_PAYLOAD_LENGTH:
-                length_flag = self._payload_length_flag
-                if length_flag == 126:
+            # read extended payload length
+            if state == READ_PAYLOAD_LENGTH:
+                if payload_length_flag == 126:
                     if buf_length - start_pos < 2:
                         break
-                    first_byte = buf[start_pos]
-                    second_byte = buf[start_pos + 1]
+                    first_byte = buf_cstr[start_pos]
+                    second_byte = buf_cstr[start_pos + 1]
                     start_pos += 2
-                    self._payload_length = first_byte << 8 | second_byte
-                elif length_flag > 126:
+                    payload_length = first_byte << 8 | second_byte
+                else:
                     if buf_length - start_pos < 8:
                         break
-                    data = buf[start_pos : start_pos + 8]
+                    payload_length = int.from_bytes(
+                        buf[start_pos : start_pos + 8], "big"
+                    )
                     start_pos += 8
-                    self._payload_length = UNPACK_LEN3(data)[0]
-                else:
-                    self._payload_length = length_flag
 
-                self._state = READ_PAYLOAD_MASK if self._has_mask else READ_PAYLOAD
+                state = READ_PAYLOAD_MASK if has_mask else READ_PAYLOAD
 
             # read payload mask
-            if self._state == READ_PAYLOAD_MASK:
+            if state == READ_PAYLOAD_MASK:
                 if buf_length - start_pos < 4:
                     break
-                self._frame_mask = buf[start_pos : start_pos + 4]
+                frame_mask = buf[start_pos : start_pos + 4]
                 start_pos += 4
-                self._state = READ_PAYLOAD
-
-            if self._state == READ_PAYLOAD:
-                length = self._payload_length
-                payload = self._frame_payload
+                state = READ_PAYLOAD
 
+            if state == READ_PAYLOAD:
                 chunk_len = buf_length - start_pos
-                if length >= chunk_len:
-                    self._payload_length = length - chunk_len
-                    payload += buf[start_pos:]
+                if not has_mask and payload_length <= chunk_len and not payload:
+                    # Fast path for unmasked frames (all frames a client
+                    # receives) whose payload is entirely in this chunk: slice
+                    # it out directly instead of copying it through the
+                    # payload buffer first.
+                    end_pos = start_pos + payload_length
+                    frames.append(
+                        (
+                            frame_fin,
+                            frame_opcode,
+                            buf[start_pos:end_pos],
+                            compressed,
+                        )
+                    )
+                    start_pos = end_pos
+                    payload_length = 0
+                    state = READ_HEADER
+                    continue
+
+                if buf_view is None:
+                    buf_view = memoryview(buf)
+                if payload_length >= chunk_len:
+                    payload_length -= chunk_len
+                    payload += buf_view[start_pos:]
                     start_pos = buf_length
                 else:
-                    self._payload_length = 0
-                    payload += buf[start_pos : start_pos + length]
-                    start_pos = start_pos + length
+                    payload += buf_view[start_pos : start_pos + payload_length]
+                    start_pos += payload_length
+                    payload_length = 0
 
-                if self._payload_length != 0:
+                if payload_length != 0:
                     break
 
-                if self._has_mask:
-                    assert self._frame_mask is not None
-                    websocket_mask(self._frame_mask, payload)
-
-                frames.append(
-                    (self._frame_fin, self._frame_opcode, payload, self._compressed)
-                )
-                self._frame_payload = bytearray()
-                self._state = READ_HEADER
-
+                if has_mask:
+                    assert frame_mask is not None
+                    websocket_mask(frame_mask, payload)
+
+                # Hand the buffer off with the frame rather than copying it,
+                # the next frame starts a new one.
+                frame = (frame_fin, frame_opcode, payload, compressed)
+                frames.append(frame)  # type: ignore[arg-type]
+                payload = bytearray()
+                state = READ_HEADER
+
+        self._state = state
+        self._payload_length = payload_length
+        self._payload_length_flag = payload_length_flag
+        self._has_mask = has_mask
+        self._frame_payload = payload
+        self._frame_mask = frame_mask
+        self._frame_fin = frame_fin
+        self._frame_opcode = frame_opcode
+        self._compressed = compressed
         self._tail = buf[start_pos:]
-
-        return frames
@@ -1,7 +1,7 @@
 import asyncio
 import zlib
 from concurrent.futures import Executor
-from typing import Optional, cast
+from typing import Optional, Union, cast
 
 try:
     try:
@@ -103,7 +103,9 @@ class ZLibDecompressor(ZlibBaseHandler):
         )
         self._decompressor = zlib.decompressobj(wbits=self._mode)
 
-    def decompress_sync(self, data: bytes, max_length: int = 0) -> bytes:
+    def decompress_sync(
+        self, data: Union[bytes, bytearray], max_length: int = 0
+    ) -> bytes:
         return self._decompressor.decompress(data, max_length)
 
     async def decompress(self, data: bytes, max_length: int = 0) -> bytes:
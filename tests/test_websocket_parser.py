@@ -218,6 +218,27 @@ def test_ping_frame(
         assert res == WSMessagePing(data=b"data", extra="")
 
 
+@pytest.mark.parametrize(
+    argnames="data_type",
+    argvalues=[bytes, bytearray, memoryview],
+    ids=["bytes", "bytearray", "memoryview"],
+)
+def test_feed_data_types(
+    out: aiohttp.DataQueue[WSMessage],
+    parser: WebSocketReader,
+    data_type: type,
+) -> None:
+    data = build_frame(b"text", WSMsgType.TEXT, use_mask=True)
+    chunk = bytearray(data[:3])
+    # Hand over the caller's buffer itself, a bytearray() call would copy it
+    parser.feed_data(chunk if data_type is bytearray else data_type(chunk))
+    # The event loop may reuse its buffer once feed_data returns
+    chunk[:] = b"\x00" * len(chunk)
+    parser.feed_data(data_type(data[3:]))
+
+    assert out._buffer[0] == WSMessageText(data="text", extra="")
+
+
 def test_pong_frame(out: aiohttp.DataQueue[WSMessage], parser: WebSocketReader) -> None:
     with mock.patch.object(parser, "parse_frame", autospec=True) as m:
         m.return_value = [(1, WSMsgType.PONG, b"data", False)]
@@ -320,6 +341,18 @@ def test_simple_binary(
         assert res == WSMessageBinary(data=b"binary", extra="")
 
 
+def test_frames_released_after_feed_data(
+    out: aiohttp.DataQueue[WSMessage], parser: WebSocketReader
+) -> None:
+    frames = [(1, WSMsgType.BINARY, b"binary", False)]
+    with mock.patch.object(parser, "parse_frame", autospec=True) as m:
+        m.return_value = frames
+
+        parser.feed_data(b"")
+        assert out._buffer[0] == WSMessageBinary(data=b"binary", extra="")
+        assert frames == []
+
+
 def test_fragmentation_header(
     out: aiohttp.DataQueue[WSMessage], parser: WebSocketReader
 ) -> None:
@@ -331,6 +364,27 @@ def test_fragmentation_header(
     assert res == WSMessageText(data="a", extra="")
 
 
+@pytest.mark.parametrize("size", [5, 200, 70000])
+def test_fragmentation_header_every_split(
+    out: aiohttp.DataQueue[WSMessage], parser: WebSocketReader, size: int
+) -> None:
+    """Ensure a frame split anywhere inside its header is reassembled."""
+    message = bytes(random.getrandbits(8) for _ in range(size))
+    data = build_frame(message, WSMsgType.BINARY, use_mask=True)
+    data += build_frame(b"", WSMsgType.PING, use_mask=True)
+    # 2 byte header, up to 8 bytes of extended length and a 4 byte mask
+    for split in range(1, 15):
+        parser._feed_data(data[:split])
+        parser._feed_data(data[split:])
+
+    for res in out._buffer:
+        assert res in (
+            WSMessageBinary(data=message, extra=""),
+            WSMessagePing(data=b"", extra=""),
+        )
+    assert len(out._buffer) == 28
+
+
 def test_continuation(
     out: aiohttp.DataQueue[WSMessage], parser: WebSocketReader
 ) -> None:
@@ -514,6 +568,36 @@ def test_websocket_mask_cython_empty() -> None:
     assert message == bytearray()
 
 
+@pytest.mark.skipif(
+    not hasattr(_websocket_helpers, "_websocket_mask_cython"), reason="Requires Cython"
+)
+@pytest.mark.parametrize("length", [3, 15, 16, 31, 32, 33, 63, 64, 1000, 65537])
+def test_websocket_mask_cython_matches_python(length: int) -> None:
+    """Ensure the vectorized and tail loops agree with the pure python mask."""
+    data = bytes(random.getrandbits(8) for _ in range(length))
+    expected = bytearray(data)
+    _websocket_helpers._websocket_mask_python(websocket_mask_mask, expected)
+    message = bytearray(data)
+    _websocket_helpers._websocket_mask_cython(websocket_mask_mask, message)  # type: ignore[attr-defined]
+    assert message == expected
+
+
+@pytest.mark.skipif(
+    not hasattr(_websocket_helpers, "_websocket_mask_cython"), reason="Requires Cython"
+)
+@pytest.mark.parametrize("offset", range(1, 8))
+def test_websocket_mask_cython_unaligned(offset: int) -> None:
+    """Ensure the mask stays in phase when the buffer is not word aligned."""
+    data = bytes(random.getrandbits(8) for _ in range(100))
+    expected = bytearray(data)
+    _websocket_helpers._websocket_mask_python(websocket_mask_mask, expected)
+    message = bytearray(b"\x00" * offset + data)
+    # Deleting from the front moves the start of the buffer without a copy
+    del message[:offset]
+    _websocket_helpers._websocket_mask_cython(websocket_mask_mask, message)  # type: ignore[attr-defined]
+    assert message == expected
+
+
 def test_parse_compress_frame_single(parser: WebSocketReader) -> None:
     parser.parse_frame(struct.pack("!BB", 0b11000001, 0b00000001))
     res = parser.parse_frame(b"1")
@@ -586,6 +670,72 @@ def test_compressed_msg_too_large(out: aiohttp.DataQueue[WSMessage]) -> None:
     assert ctx.value.code == WSCloseCode.MESSAGE_TOO_BIG
 
 
+def _build_compressed_fragments(message: bytes, split: int) -> bytes:
+    compressobj = zlib.compressobj(wbits=-9)
+    data = compressobj.compress(message) + compressobj.flush(zlib.Z_SYNC_FLUSH)
+    assert data.endswith(WS_DEFLATE_TRAILING)
+    data = data[:-4]
+    first, second = data[:split], data[split:]
+    return (
+        PACK_LEN1(0x40 | WSMsgType.TEXT, len(first))
+        + first
+        + PACK_LEN1(0x80 | WSMsgType.CONTINUATION, len(second))
+        + second
+    )
+
+
+def test_compressed_fragmented_msg(
+    out: aiohttp.DataQueue[WSMessage], parser: WebSocketReader
+) -> None:
+    message = b"fragmented compressed message " * 3
+    parser._feed_data(_build_compressed_fragments(message, 5))
+    assert out._buffer[0] == WSMessageText(data=message.decode(), extra="")
+
+
+def test_compressed_fragmented_msg_too_large(
+    out: aiohttp.DataQueue[WSMessage],
+) -> None:
+    parser = WebSocketReader(out, 256, compress=True)
+    data = _build_compressed_fragments(b"aaa" * 256, 4)
+    with pytest.raises(WebSocketError) as ctx:
+        parser._feed_data(data)
+    assert ctx.value.code == WSCloseCode.MESSAGE_TOO_BIG
+
+
+@pytest.mark.parametrize("size", [255, 256, 257])
+def test_compressed_msg_size_limit(
+    out: aiohttp.DataQueue[WSMessage], size: int
+) -> None:
+    parser = WebSocketReader(out, 256, compress=True)
+    data = build_frame(b"a" * size, WSMsgType.TEXT, compress=True)
+    if size <= 256:
+        parser._feed_data(data)
+        assert out._buffer[0] == WSMessageText(data="a" * size, extra="")
+    else:
+        with pytest.raises(WebSocketError) as ctx:
+            parser._feed_data(data)
+        assert ctx.value.code == WSCloseCode.MESSAGE_TOO_BIG
+
+
+def test_compressed_fragment_inflating_to_nothing_then_new_msg(
+    out: aiohttp.DataQueue[WSMessage], parser: WebSocketReader
+) -> None:
+    compressobj = zlib.compressobj(wbits=-9)
+    data = compressobj.compress(b"hello world") + compressobj.flush(zlib.Z_SYNC_FLUSH)
+    data = data[:-4]
+    # A single byte of deflate data does not inflate to anything yet
+    first, second = data[:1], data[1:]
+    frames = (
+        PACK_LEN1(0x40 | WSMsgType.TEXT, len(first))
+        + first
+        + PACK_LEN1(0x80 | WSMsgType.TEXT, len(second))
+        + second
+    )
+    with pytest.raises(WebSocketError) as ctx:
+        parser._feed_data(frames)
+    assert ctx.value.code == WSCloseCode.PROTOCOL_ERROR
+
+
 class TestWebSocketError:
     def test_ctor(self) -> None:
         err = WebSocketError(WSCloseCode.PROTOCOL_ERROR, "Something invalid")